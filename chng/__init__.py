@@ -17,6 +17,9 @@
 
 from .modpack import ModPack
 from .modpacklist import ModPackList
+from .fileutils import ExtractFilter
+from .progress import Monitor, ProgressEvent, CancelledException
+from .api import Client, DeployException
 
 import requests_cache
 import logging
@@ -26,9 +29,9 @@ import os
 import shutil
 import argparse
 
-logging.basicConfig(level=logging.INFO)
-
 def run():
+    logging.basicConfig(level=logging.INFO)
+
     # Initialize requests cache
     home = os.path.expanduser("~")
     requests_cache.install_cache(home + '/.chng_requests_cache')
@@ -57,6 +60,16 @@ def run():
     parser.add_argument('-s', '--show', dest="show", action='store_const',
                         const=True, default=False,
                         help='show more information about a pack')
+    parser.add_argument('--include', dest="includes", metavar='PATTERN',
+                        action='append', default=[],
+                        help='only extract files matching PATTERN from '
+                             'Configs.zip and extract type mods (relative '
+                             'to where each archive is extracted)')
+    parser.add_argument('--exclude', dest="excludes", metavar='PATTERN',
+                        action='append', default=[],
+                        help='do not extract files matching PATTERN from '
+                             'Configs.zip and extract type mods (relative '
+                             'to where each archive is extracted)')
     #TODO#parser.add_argument('-c', '--client', dest="client", action='store_const',
     #TODO#                    const=True, default=False,
     #TODO#                    help='install as client (default is server)')
@@ -139,7 +152,12 @@ def run():
         # Ensure that everything is available on disk
         server = True
         #TODO#server = not args.client
-        modpack.ensure(server)
+        extract_filter = None
+        if server:
+            extract_filter = ExtractFilter.server(args.includes, args.excludes)
+        elif args.includes or args.excludes:
+            extract_filter = ExtractFilter(args.includes, args.excludes)
+        modpack.ensure(server, extract_filter=extract_filter)
     else:
         print("No action requested")
         parser.print_help()
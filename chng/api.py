@@ -0,0 +1,124 @@
+# chng - Deploy ATLauncher modpacks
+#
+# Copyright (C) 2016  Jonas Eriksson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from .modpacklist import ModPackList
+from .progress import Monitor
+
+import asyncio
+import functools
+import threading
+
+class DeployException(Exception):
+    pass
+
+class Client():
+    """Programmatic interface to chng
+
+    The pack list is downloaded the first time it is needed and then kept,
+    so a long-lived Client can be used for any number of deploys. Deploys
+    may run concurrently from several threads.
+    """
+    def __init__(self, modpacklist=None):
+        self._modpacklist = modpacklist
+        self._lock = threading.Lock()
+
+    @property
+    def modpacklist(self):
+        with self._lock:
+            if self._modpacklist is None:
+                self._modpacklist = ModPackList()
+            return self._modpacklist
+
+    def reload(self):
+        modpacklist = ModPackList()
+        with self._lock:
+            self._modpacklist = modpacklist
+
+    def modpackinfos(self):
+        return self.modpacklist.modpackinfos()
+
+    def get_modpackinfo(self, name):
+        modpackinfo = self.modpacklist.get_modpackinfo(name)
+        if modpackinfo is None:
+            raise DeployException("No such modpack: %s" % (name,))
+        return modpackinfo
+
+    def deploy(self, name, directory, version=None, server=True,
+               optional=(), progress=None, monitor=None, extract_filter=None):
+        """Install a modpack, returning the ModPack instance
+
+        Optional mods are installed only if their names are in optional.
+        extract_filter is an ExtractFilter for the configs and extract type
+        mods; server installs use ExtractFilter.server() by default.
+        progress is called with a ProgressEvent as the deploy proceeds. To
+        be able to cancel the deploy, pass a Monitor and call its cancel()
+        method; progress is ignored if a monitor is given.
+        """
+        if monitor is None:
+            monitor = Monitor(progress)
+        modpackinfo = self.get_modpackinfo(name)
+        if modpackinfo.get_version(version) is None:
+            if version is None:
+                raise DeployException("No installable version of %s" %
+                                      (modpackinfo.name,))
+            raise DeployException("No such version of %s: %s" %
+                                  (modpackinfo.name, version))
+        modpack = modpackinfo.to_modpack(directory, version=version,
+                                         monitor=monitor)
+
+        # Select optional mods
+        optional_names = set()
+        for modfile in modpack.get_modfiles():
+            if modfile.optional:
+                optional_names.add(modfile.name)
+                modfile.download = modfile.name in optional
+        unknown = set(optional) - optional_names
+        if unknown:
+            raise DeployException("No such optional mods in %s: %s" %
+                                  (modpackinfo.name,
+                                   ", ".join(sorted(unknown))))
+
+        modpack.ensure(server, monitor=monitor, extract_filter=extract_filter)
+        return modpack
+
+    async def deploy_async(self, name, directory, version=None, server=True,
+                           optional=(), progress=None, monitor=None,
+                           extract_filter=None):
+        """Coroutine version of deploy()
+
+        The deploy is run in the default executor of the event loop, and
+        progress is called in the event loop thread. Cancelling the task
+        cancels the deploy, but only cooperatively: CancelledError is
+        raised at once, while the worker thread keeps writing files until
+        it reaches its next cancellation check.
+        """
+        loop = asyncio.get_running_loop()
+        if monitor is None:
+            callback = None
+            if progress is not None:
+                def callback(event):
+                    loop.call_soon_threadsafe(progress, event)
+            monitor = Monitor(callback)
+        work = functools.partial(self.deploy, name, directory,
+                                 version=version, server=server,
+                                 optional=optional, monitor=monitor,
+                                 extract_filter=extract_filter)
+        try:
+            return await loop.run_in_executor(None, work)
+        except asyncio.CancelledError:
+            monitor.cancel()
+            raise
@@ -20,12 +20,108 @@ import urllib.parse
 from pathlib import Path
 import hashlib
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+import json
 import requests
 import logging
 
+class _Crc32():
+    # Minimal hashlib-like wrapper around zlib.crc32
+    name = 'crc32'
+
+    def __init__(self):
+        self._crc = 0
+
+    def update(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+
+    def value(self):
+        return self._crc & 0xFFFFFFFF
+
+    def hexdigest(self):
+        return "%08x" % (self.value(),)
+
+class MultiHasher():
+    """Feed the same data to several digests at once
+
+    Supports all algorithms known to hashlib, plus 'crc32'. When more than
+    one digest is calculated, the updates are run in a thread pool; hashlib
+    and zlib release the GIL while hashing larger buffers, so the digests
+    are calculated in parallel. The data passed to update() is
+    hashed in the background and must not be modified until the next call
+    to update() or hexdigests().
+    """
+    CHUNK_SIZE = 1024*1024
+
+    def __init__(self, algorithms=('md5',)):
+        self._hashers = {}
+        for name in algorithms:
+            if name == 'crc32':
+                self._hashers[name] = _Crc32()
+            else:
+                self._hashers[name] = hashlib.new(name)
+        self._executor = None
+        if len(self._hashers) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=len(self._hashers))
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _wait(self):
+        for future in self._pending:
+            future.result()
+        self._pending = []
+
+    def update(self, data):
+        data = memoryview(data)
+        # Only one chunk may be in flight, wait for the previous one
+        self._wait()
+        if self._executor is None:
+            for hasher in self._hashers.values():
+                hasher.update(data)
+        else:
+            self._pending = [self._executor.submit(hasher.update, data)
+                             for hasher in self._hashers.values()]
+
+    def update_from_file(self, path, monitor=None):
+        # Read into two alternating buffers, so that the next chunk can be
+        # read while the previous one is being hashed
+        buffers = [bytearray(self.CHUNK_SIZE), bytearray(self.CHUNK_SIZE)]
+        current = 0
+        with path.open('rb', buffering=0) as f:
+            while True:
+                view = memoryview(buffers[current])
+                if monitor is not None:
+                    monitor.check()
+                size = f.readinto(view)
+                if not size:
+                    break
+                self.update(view[:size])
+                current ^= 1
+        self._wait()
+
+    def hexdigests(self):
+        self._wait()
+        return dict((name, hasher.hexdigest())
+                    for name, hasher in self._hashers.items())
+
 class DownloadException(Exception):
     pass
 class DownloadableFile():
+    # Checksums calculated for every file passing through ensure()
+    hash_algorithms = ('md5', 'sha1', 'sha256', 'crc32')
+
     def __init__(self, url, directory, md5sum=None, filename=None):
         self._url = url
         self._md5sum = md5sum
@@ -47,6 +143,10 @@ class DownloadableFile():
         self._filename = filename
         self._path = Path(directory) / filename
 
+        # Checksums of the file on disk, filled in by ensure() and saved
+        # next to the file
+        self.digests = None
+
     def _unshorten(self):
         # Unshorten any shorted urls
         if self._url.startswith("http://adf.ly"):
@@ -56,7 +156,7 @@ class DownloadableFile():
                                         % (self._url,))
             self._url = new_url
 
-    def ensure(self):
+    def ensure(self, monitor=None):
         # Create parent directory
         if not self._path.parent.exists():
             logging.info("Creating directory '%s'", self._path.parent)
@@ -67,23 +167,28 @@ class DownloadableFile():
         # If the file exists, validate it
         if self._path.exists():
             if self._md5sum is not None:
-                hasher = hashlib.md5()
-                with self._path.open(mode='rb') as f:
-                    while True:
-                        hasher.update(f.read(1024*1024))
-                        if f.eof():
-                            break
-                file_md5sum = hasher.hexdigest()
+                # Only hash the file if it has changed since the saved
+                # digests were calculated
+                digests = self._load_digests()
+                if digests is None:
+                    with MultiHasher(self._hash_algorithms()) as hasher:
+                        hasher.update_from_file(self._path, monitor)
+                        digests = hasher.hexdigests()
+                    self._save_digests(digests)
+                file_md5sum = digests['md5']
                 if (file_md5sum == self._md5sum):
                     # All is well
                     logging.info("Hash ok for '%s', not downloading",
                                  self._path)
+                    self.digests = digests
                     return
                 else:
                     # There should not be any mismatches here, strange.
                     logging.warning("Hash mismatch for '%s' (expected: %s, got: %s) removing file",
-                                    (self._path, self._md5sum, file_md5sum))
+                                    self._path, self._md5sum, file_md5sum)
                     self._path.unlink()
+                    if self._digests_path.exists():
+                        self._digests_path.unlink()
 
         # Make sure that we don't use a link to a url shortener service
         self._unshorten()
@@ -93,18 +198,29 @@ class DownloadableFile():
         if self._md5sum is not None:
             headers['etag'] = self._md5sum
         logging.info("Downloading %s", self._url)
-        request = requests.get(self._url, headers=headers)
+        request = requests.get(self._url, headers=headers, stream=True)
         if not request.status_code == 200:
             logging.error("Unable to download url '%s'"
                                     % (self._url,))
             request.raise_for_status()
 
-        # Write the file, and check the md5 checksum while doing it
-        hasher = hashlib.md5()
-        with self._path.open(mode='wb') as f:
-            hasher.update(request.content)
-            f.write(request.content)
-        file_md5sum = hasher.hexdigest()
+        # Write the file, and calculate the checksums while doing it
+        with MultiHasher(self._hash_algorithms()) as hasher:
+            try:
+                with self._path.open(mode='wb') as f:
+                    for chunk in request.iter_content(MultiHasher.CHUNK_SIZE):
+                        hasher.update(chunk)
+                        f.write(chunk)
+                        if monitor is not None:
+                            monitor.add_bytes(len(chunk))
+            except BaseException:
+                # Do not leave a partial file behind, it could be mistaken
+                # for a complete one if there is no checksum to compare with
+                if self._path.exists():
+                    self._path.unlink()
+                raise
+            digests = hasher.hexdigests()
+        file_md5sum = digests['md5']
 
         # Check the ETag, if we got one from the server
         #etag = request.headers.get('etag')
@@ -121,16 +237,110 @@ class DownloadableFile():
             raise DownloadException("Hash mismatch for '%s' (expected: %s, got: %s) removing file" %
                                     (self._url, self._md5sum, file_md5sum))
 
+        self.digests = digests
+        self._save_digests(digests)
+
+    @property
+    def _digests_path(self):
+        return self._path.with_name("." + self._path.name + ".digests")
+
+    def _load_digests(self):
+        # Saved digests are only valid for an unchanged file
+        if not self._digests_path.exists():
+            return None
+        try:
+            with self._digests_path.open('r') as f:
+                saved = json.load(f)
+        except ValueError:
+            return None
+        stat = self._path.stat()
+        if saved.get('size') != stat.st_size or \
+                saved.get('mtime_ns') != stat.st_mtime_ns:
+            return None
+        digests = saved.get('digests', {})
+        for name in self._hash_algorithms():
+            if not name in digests:
+                return None
+        return digests
+
+    def _save_digests(self, digests):
+        stat = self._path.stat()
+        with self._digests_path.open('w') as f:
+            json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                       'digests': digests}, f, sort_keys=True)
+
+    def _hash_algorithms(self):
+        # md5 is always needed, it is what the pack metadata gives us
+        algorithms = list(self.hash_algorithms)
+        if not 'md5' in algorithms:
+            algorithms.insert(0, 'md5')
+        return algorithms
+
 from zipfile import ZipFile
-from binascii import crc32
 from pathlib import Path
+from fnmatch import fnmatchcase
 import logging
 class UnpackException(Exception):
     pass
+class ExtractFilter():
+    """Select which entries of an archive to extract
+
+    Patterns are shell-style paths relative to the directory the archive
+    is extracted to, and are matched one path component at a time, so '*'
+    and '?' never match a '/'. A pattern matches an entry if it matches
+    the entry path or one of its parent directories: 'resourcepacks'
+    matches everything in that directory, while 'options*.txt' only
+    matches files at the top level. An entry is extracted if it matches
+    one of the includes (or there are none) and none of the excludes.
+    """
+    # Things in Configs.zip that are of no use to a server
+    SERVER_EXCLUDES = (
+        'resourcepacks',
+        'shaderpacks',
+        'texturepacks',
+        'screenshots',
+        'options*.txt',
+        'servers.dat',
+    )
+
+    def __init__(self, includes=(), excludes=()):
+        self._includes = [p.strip("/").split("/") for p in includes]
+        self._excludes = [p.strip("/").split("/") for p in excludes]
+
+    @classmethod
+    def server(cls, includes=(), excludes=()):
+        return cls(includes, cls.SERVER_EXCLUDES + tuple(excludes))
+
+    @staticmethod
+    def _matches(parts, patterns):
+        for pattern in patterns:
+            # Compare the pattern with the path, or the parent directory,
+            # that has as many components as the pattern
+            if len(pattern) > len(parts):
+                continue
+            matched = True
+            for part, pattern_part in zip(parts, pattern):
+                if not fnmatchcase(part, pattern_part):
+                    matched = False
+                    break
+            if matched:
+                return True
+        return False
+
+    def wanted(self, name):
+        parts = name.strip("/").split("/")
+        if self._includes and not self._matches(parts, self._includes):
+            return False
+        return not self._matches(parts, self._excludes)
+
+    def filter(self, infolist):
+        return [info for info in infolist if self.wanted(info.filename)]
+
 class AutoUnpackableFile(DownloadableFile):
     def __init__(self, url, directory, pack_format=None, md5sum=None,
-                 filename=None):
+                 filename=None, extract_filter=None):
         super().__init__(url, directory, md5sum, filename)
+        self.extract_filter = extract_filter
 
         # Create unpack handlers dict
         self._unpack_handlers = {
@@ -160,30 +370,39 @@ class AutoUnpackableFile(DownloadableFile):
         if not pack_format == "none":
             self._path = self._path.parent / ".packed" / self._path.name
 
-    def ensure(self):
+    def ensure(self, monitor=None):
         # Take care of the download
-        super().ensure()
+        super().ensure(monitor)
 
         # Call the unpack handler
         handler = self._unpack_handlers[self._pack_format]
         if handler is not None:
-            handler()
+            handler(monitor)
 
     @staticmethod
-    def _get_crc32(path):
-        with path.open('rb') as f:
-            crc = 0
+    def _get_crc32(path, buf):
+        # buf is reused for every file in the archive
+        view = memoryview(buf)
+        crc = 0
+        with path.open('rb', buffering=0) as f:
             while True:
-                data = f.read(1024*1024)
-                if data == b'':
+                size = f.readinto(view)
+                if not size:
                     break
-                crc = crc32(data, crc)
-            return crc & 0xFFFFFFFF
+                crc = zlib.crc32(view[:size], crc)
+        return crc & 0xFFFFFFFF
 
-    def _unpack_zip(self):
+    def _unpack_zip(self, monitor=None):
+        buf = bytearray(MultiHasher.CHUNK_SIZE)
         with ZipFile(str(self._path), 'r') as f:
             logging.debug("In %s", self._path)
-            for info in f.infolist():
+            # Filter the central directory before touching the disk
+            infolist = f.infolist()
+            if self.extract_filter is not None:
+                infolist = self.extract_filter.filter(infolist)
+            for info in infolist:
+                if monitor is not None:
+                    monitor.check()
                 file_path = self._dest_path / Path(info.filename)
                 extract = False
                 logging.debug("Checking out %s", info.filename)
@@ -193,7 +412,7 @@ class AutoUnpackableFile(DownloadableFile):
                 else:
                     if file_path.exists():
                         # Check crc of file on disk
-                        file_crc = self._get_crc32(file_path)
+                        file_crc = self._get_crc32(file_path, buf)
                         if info.CRC != file_crc:
                             extract = True
                     else:
@@ -15,7 +15,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from .fileutils import AutoUnpackableFile
+from .fileutils import AutoUnpackableFile, ExtractFilter
 
 import re
 import tempfile
@@ -26,7 +26,8 @@ import logging
 
 class ModFile(AutoUnpackableFile):
     def __init__(self, name, version, url, directory, server=True, client=True,
-                 optional=False, pack_format=None, md5sum=None, filename=None):
+                 optional=False, pack_format=None, md5sum=None, filename=None,
+                 extract=False):
         super().__init__(url, directory, pack_format=pack_format,
                          md5sum=md5sum, filename=filename)
         self.name = name
@@ -34,9 +35,10 @@ class ModFile(AutoUnpackableFile):
         self._server = server
         self._client = client
         self.optional = optional
+        self.extract = extract
         self.download = not optional
 
-    def ensure(self, server=True):
+    def ensure(self, server=True, monitor=None):
         if not self.download:
             return
         download = False
@@ -45,26 +47,33 @@ class ModFile(AutoUnpackableFile):
         else:
             download = self._client
         if download:
-            super().ensure()
+            super().ensure(monitor)
 
 class ModPack():
     BASE_URL = "http://download.nodecdn.net/containers/atl/"
 
-    def __init__(self, name, version, directory):
+    def __init__(self, name, version, directory, monitor=None):
         self._name = name
         self._safe_name = re.sub("[^A-Za-z0-9]", "", name)
         self._version = version
         self._base_directory = Path(directory)
+        self._configs = None
         if not self._base_directory.exists():
             self._base_directory.mkdir(mode=0o755, parents=True)
 
         # Download the mod config xml
+        if monitor is not None:
+            monitor.set_phase("metadata", files_total=1)
+            monitor.file_started(".Configs.xml")
         config_url = self.BASE_URL + "packs/%s/versions/%s/Configs.xml" % \
                                      (self._safe_name, version)
-        config_file = AutoUnpackableFile(config_url, self._base_directory,
-                                         pack_format="none",
-                                         filename=".Configs.xml")
-        config_file.ensure()
+        self._config_file = AutoUnpackableFile(config_url,
+                                               self._base_directory,
+                                               pack_format="none",
+                                               filename=".Configs.xml")
+        self._config_file.ensure(monitor)
+        if monitor is not None:
+            monitor.file_done()
         config_path = self._base_directory / ".Configs.xml"
 
         # Parse the XML and extract all elements
@@ -112,6 +121,7 @@ class ModPack():
             client = True
             # Most mods and all libs are not optional
             optional = False
+            extract = False
 
             if type == 'mod':
                 filename = node.attrib.get('file')
@@ -126,11 +136,11 @@ class ModPack():
                     extractto = node.attrib['extractto']
                     # These are always zip files
                     pack_format = "zip"
+                    extract = True
                     if extractto == "root":
                         directory = self._base_directory
                     elif extractto == "mods":
                         directory = download_directories['mods']
-                        k
                 # Optional?
                 if 'optional' in node.attrib and node.attrib['optional'] == "yes":
                     optional = True
@@ -146,7 +156,7 @@ class ModPack():
             modfile = ModFile(name, version, url, directory,
                               pack_format=pack_format, md5sum=md5,
                               filename=filename, server=server, client=client,
-                              optional=optional)
+                              optional=optional, extract=extract)
 
             self._modfiles.append(modfile)
 
@@ -161,6 +171,13 @@ class ModPack():
     def get_modfiles(self):
         return self._modfiles
 
+    def get_configfiles(self):
+        # Configs.zip is only known once ensure() has been called
+        configfiles = [self._config_file]
+        if self._configs is not None:
+            configfiles.append(self._configs)
+        return configfiles
+
     @staticmethod
     def _yesno_parse(yesno):
         if yesno == "yes":
@@ -179,20 +196,41 @@ class ModPack():
             # Probably adf.ly, Handled by downloading magic
             return url
 
-    def ensure(self, server):
+    def ensure(self, server, monitor=None, extract_filter=None):
+        # Leave out client-only files from server installs, unless the
+        # caller wants something else
+        if extract_filter is None and server:
+            extract_filter = ExtractFilter.server()
+
         # Configs zip
         configs_url = self.BASE_URL + "packs/%s/versions/%s/Configs.zip" % \
             (self._safe_name, self._version)
-        configs = AutoUnpackableFile(configs_url, self._base_directory,
-                                     pack_format="zip")
+        self._configs = AutoUnpackableFile(configs_url, self._base_directory,
+                                           pack_format="zip",
+                                           extract_filter=extract_filter)
 
         # Download all files
-        configs.ensure()
+        if monitor is not None:
+            monitor.set_phase("configs", files_total=1)
+            monitor.file_started("Configs.zip")
+        self._configs.ensure(monitor)
+        if monitor is not None:
+            monitor.file_done()
+            monitor.set_phase("files", files_total=len(self._modfiles))
 
         for modfile in self._modfiles:
-            modfile.ensure(server)
+            if modfile.extract:
+                modfile.extract_filter = extract_filter
+            if monitor is not None:
+                monitor.file_started(modfile.name)
+            modfile.ensure(server, monitor)
+            if monitor is not None:
+                monitor.file_done()
 
         # Create eula.txt
         eula = self._base_directory / "eula.txt"
         with eula.open("w") as f:
             f.write("eula=true")
+
+        if monitor is not None:
+            monitor.set_phase("done")
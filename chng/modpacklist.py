@@ -64,18 +64,20 @@ class ModPackInfo():
         elif len(self.dev_versions) > 0:
             self._version_latest = self.dev_versions[0]
 
-    def to_modpack(self, directory, version=None):
-        # Figure out the correct version
-        modver = None
+    def get_version(self, version=None):
+        # Use the latest version if none is given
         if version is None:
-            modver = self._version_latest
-        else:
-            modver = self._versions_dict.get(version)
+            return self._version_latest
+        return self._versions_dict.get(version)
+
+    def to_modpack(self, directory, version=None, monitor=None):
+        # Figure out the correct version
+        modver = self.get_version(version)
         if modver is None:
             raise Exception("Unable to select version")
 
         # Create modpack instance
-        return ModPack(self.name, modver.version, directory)
+        return ModPack(self.name, modver.version, directory, monitor=monitor)
 
 class ModPackList():
     BASE_URL = "http://download.nodecdn.net/containers/atl/"
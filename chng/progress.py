@@ -0,0 +1,89 @@
+# chng - Deploy ATLauncher modpacks
+#
+# Copyright (C) 2016  Jonas Eriksson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+class CancelledException(Exception):
+    pass
+
+class ProgressEvent():
+    def __init__(self, phase, name, bytes_done, files_done, files_total):
+        self.phase = phase
+        self.name = name
+        self.bytes_done = bytes_done
+        self.files_done = files_done
+        self.files_total = files_total
+
+    def __repr__(self):
+        return "ProgressEvent(%r, %r, bytes=%d, files=%d/%d)" % \
+            (self.phase, self.name, self.bytes_done, self.files_done,
+             self.files_total)
+
+class Monitor():
+    """Progress reporting and cooperative cancellation for a deploy
+
+    The callback, if any, is called with a ProgressEvent from the thread
+    doing the work. cancel() may be called from any thread; the work is
+    aborted with a CancelledException at the next file or download chunk.
+    """
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._cancel_event = threading.Event()
+        self.phase = None
+        self.name = None
+        self.bytes_done = 0
+        self.files_done = 0
+        self.files_total = 0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise CancelledException("Cancelled during %s" % (self.phase,))
+
+    def set_phase(self, phase, files_total=0):
+        self.check()
+        self.phase = phase
+        self.name = None
+        self.files_done = 0
+        self.files_total = files_total
+        self._emit()
+
+    def file_started(self, name):
+        self.check()
+        self.name = name
+        self._emit()
+
+    def file_done(self):
+        self.files_done += 1
+        self._emit()
+
+    def add_bytes(self, count):
+        self.bytes_done += count
+        self._emit()
+        self.check()
+
+    def _emit(self):
+        if self._callback is not None:
+            self._callback(ProgressEvent(self.phase, self.name,
+                                         self.bytes_done, self.files_done,
+                                         self.files_total))